@@ -2,10 +2,14 @@
 
 from __future__ import annotations
 
+import json
 import logging
 import os
+import pathlib
+import threading
+import time
 from collections.abc import Generator, Iterator
-from io import StringIO, TextIOBase
+from io import StringIO
 from typing import TYPE_CHECKING
 
 import boto3
@@ -16,26 +20,36 @@ if TYPE_CHECKING:
     from mypy_boto3_bedrock_runtime import type_defs as brtd
 
 logger = logging.getLogger("app")
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s.%(msecs)03d %(levelname)8s %(name)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s.%(msecs)03d %(levelname)8s %(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
 
 TITLE = "Streamlit Bedrock Playground"
+MY_NAME = os.path.basename(__file__)
+MY_SOURCE = pathlib.Path(__file__).read_bytes()
 
-MODEL_IDS = [
+MODEL_IDS = (
     "mistral.mistral-small-2402-v1:0",
     "mistral.mistral-large-2402-v1:0",
     "amazon.titan-text-lite-v1",
     "amazon.titan-text-express-v1",
     "amazon.titan-text-premier-v1:0",
-]
+)
+
+# minimum time (in seconds) between chunks handed to `st.write_stream`
+STREAM_FLUSH_INTERVAL = 0.01
 
 
 def main():
     st.set_page_config(TITLE, layout="wide")
 
+    # start making the (cached) bedrock client in the background, so it is
+    # (probably) ready by the time the user submits their first request
+    warm_bedrock_client()
+
     render_sidebar()
 
     left, right = st.columns((1, 1))
@@ -45,18 +59,25 @@ def main():
         streaming = st.toggle("Stream response")
         submit = st.button("Submit")
 
+        # don't spend a bedrock request on an empty prompt
+        if submit and not params["messages"][0]["content"][0]["text"].strip():
+            st.warning("Enter a prompt first.")
+            submit = False
+
     with right:
         if submit and streaming:
             generate_and_render_streaming_response(params)
         else:
             generate_and_render_response(params, submit)
 
-    # make the (cached) bedrock client after everything else is rendered,
-    # so it is available immediately on subsequent renders
-    get_bedrock_client()
-
 
 def generate_and_render_response(params, submit: bool) -> None:
+    # make the request before rendering anything, so the response can be shown
+    # in this same run instead of needing a rerun
+    if submit:
+        with st.spinner("Consulting the AI..."):
+            st.session_state.response = converse(params)
+
     response = st.session_state.get("response")
 
     response_container = st.container()
@@ -70,63 +91,75 @@ def generate_and_render_response(params, submit: bool) -> None:
             st.markdown(text_response)
             st.download_button("Download Response", text_response, file_name="response.txt")
 
-    with inspect_container:
-        st.subheader("Parameters")
-        st.write(params)
-
-        if response:
-            st.subheader("Response")
-            st.write(response)
-
-    if submit:
-        with response_container.spinner("Consulting the AI..."):
-            response = get_bedrock_client().converse(**params)
-        st.session_state.response = response
-        st.rerun()
+    inspect = {"parameters": params}
+    if response:
+        inspect["response"] = sanitize_response(response)
+    inspect_container.json(inspect)
 
 
 def generate_and_render_streaming_response(params) -> None:
     response_container = st.container()
     inspect_container = st.container(border=True)
-    collector_stream = StringIO()
-
-    with inspect_container:
-        st.subheader("Parameters")
-        st.write(params)
+    chunks: list[str] = []
+    metadata: dict = {}
 
     with response_container:
         st.subheader("Awaiting response...")
         response = get_bedrock_client().converse_stream(**params)
 
         st.session_state.response = response
-        inspect_container.subheader("Response")
-        inspect_container.write(response)
 
-        stream = stream_wrapper(response["stream"], collector_stream)
+        stream = stream_wrapper(response["stream"], chunks, metadata)
         st.write_stream(stream)
 
-        collector_stream.seek(0)
-        response["stream"] = collector_stream
+        # keep the stream's usage and latency figures on the response, in the same
+        # place a non-streaming converse response has them, for the inspect panel
+        response.update(metadata)
+
+        text_response = "".join(chunks)
+        response["stream"] = StringIO(text_response)
 
-        text_response = collector_stream.getvalue()
         st.download_button("Download Response", text_response, file_name="response.txt")
 
+    inspect_container.json({"parameters": params, "response": sanitize_response(response)})
+
     st.rerun()
 
 
 def stream_wrapper(
-    stream: Iterator[brtd.ConverseStreamResponseTypeDef | str],
-    write_copy: TextIOBase | None = None,
+    stream: Iterator[brtd.ConverseStreamResponseTypeDef],
+    write_copy: list[str] | None = None,
+    metadata: dict | None = None,
 ) -> Generator[str]:
+    # bedrock sends lots of tiny deltas, and streamlit re-renders on every chunk
+    # we yield, so coalesce them into at most one chunk per flush interval
+    buffer: list[str] = []
+    last_flush = time.monotonic()
+
     for event in stream:
         match event:
-            case {"contentBlockDelta": {"delta": {"text": text}}} | str(text):
+            case {"contentBlockDelta": {"delta": {"text": text}}}:
                 if write_copy is not None:
-                    write_copy.write(text)
-                yield text
-
-    if hasattr(stream, "seek") and callable(stream.seek):
-        stream.seek(0)
+                    write_copy.append(text)
+                buffer.append(text)
+                if time.monotonic() - last_flush < STREAM_FLUSH_INTERVAL:
+                    continue
+            case {"contentBlockStop": _} | {"messageStop": _}:
+                pass
+            case {"metadata": event_metadata}:
+                if metadata is not None:
+                    metadata.update(event_metadata)
+                continue
+            case _:
+                continue
+
+        if buffer:
+            yield "".join(buffer)
+            buffer.clear()
+        last_flush = time.monotonic()
+
+    if buffer:
+        yield "".join(buffer)
 
 
 # def stream_event_print_handler(event: brtd.ConverseStreamResponseTypeDef) -> None:
@@ -177,6 +210,14 @@ def params_dialog() -> dict:
 
 
 def inference_dialog(max_max_tokens: int = 8192) -> brtd.InferenceConfigurationTypeDef | None:
+    inference_fragment(max_max_tokens)
+    return st.session_state.get("inference_config")
+
+
+@st.fragment
+def inference_fragment(max_max_tokens: int) -> None:
+    # runs as a fragment so dragging the sliders doesn't rerun the whole page;
+    # the result is handed back to `inference_dialog` through session state
     inference: brtd.InferenceConfigurationTypeDef = {}
     with st.expander("Inference Parameters"):
         left, right = st.columns((1, 2))
@@ -187,38 +228,83 @@ def inference_dialog(max_max_tokens: int = 8192) -> brtd.InferenceConfigurationT
 
         left, right = st.columns((1, 2))
         set_top_P = left.toggle("Set topP", key="set_top_p")
-        top_P = right.slider("topP", min_value=0.0, max_value=1.0, disabled=(not set_top_P))
+        top_P = right.slider("topP", min_value=0.0, max_value=1.0, value=1.0, disabled=(not set_top_P))
         if set_top_P:
             inference["topP"] = top_P
 
         left, right = st.columns((1, 2))
         set_max_tokens = left.toggle("Set maxTokens", key="set_max_tokens")
-        max_tokens = right.slider("maxTokens", min_value=0, max_value=max_max_tokens, disabled=(not set_max_tokens))
+        max_tokens = right.slider(
+            "maxTokens",
+            min_value=1,
+            max_value=max_max_tokens,
+            value=min(1024, max_max_tokens),
+            disabled=(not set_max_tokens),
+        )
         if set_max_tokens:
             inference["maxTokens"] = max_tokens
 
-    return inference or None
+    st.session_state.inference_config = inference or None
 
 
 @st.fragment
 def self_download():
-    my_name = os.path.basename(__file__)
-    with open(__file__) as fin:
-        st.download_button("Download This App", fin, file_name=my_name)
+    st.download_button("Download This App", MY_SOURCE, file_name=MY_NAME)
+
 
+@st.cache_resource(show_spinner=False)
+def get_boto_session() -> boto3.Session:
+    return boto3.Session()
 
-@st.cache_resource
+
+@st.cache_resource(show_spinner=False)
 def get_bedrock_client() -> BedrockRuntimeClient:
-    return boto3.client("bedrock-runtime")
+    return get_boto_session().client("bedrock-runtime")
+
+
+@st.cache_resource(show_spinner=False)
+def warm_bedrock_client() -> threading.Thread:
+    thread = threading.Thread(target=get_bedrock_client, name="warm-bedrock-client", daemon=True)
+    thread.start()
+    return thread
+
+
+def converse(params: dict) -> brtd.ConverseResponseTypeDef:
+    # with temperature pinned to zero the response is (near enough) deterministic,
+    # so repeat submissions of the same request can be answered from the cache
+    if params.get("inferenceConfig", {}).get("temperature") == 0.0:
+        return cached_converse(json.dumps(params, sort_keys=True))
+    return get_bedrock_client().converse(**params)
+
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def cached_converse(params_json: str) -> brtd.ConverseResponseTypeDef:
+    return get_bedrock_client().converse(**json.loads(params_json))
+
+
+def sanitize_response(response: dict) -> dict:
+    # a streamed response carries its (already replayed) text in a StringIO;
+    # show the text itself rather than the object's repr
+    match response.get("stream"):
+        case None:
+            return response
+        case StringIO() as stream:
+            return {**response, "stream": stream.getvalue()}
+        case _:
+            return {key: value for key, value in response.items() if key != "stream"}
 
 
 def make_user_message(*text_items: str) -> dict:
-    return {"role": "user", "content": [{"text": item for item in text_items}]}
+    return {"role": "user", "content": [{"text": item} for item in text_items]}
 
 
 def extract_assistant_text(response: brtd.ConverseResponseTypeDef) -> Generator[str]:
     if stream := response.get("stream"):
-        yield from stream_wrapper(stream)
+        # a replayed stream already holds the collected text; no need to re-walk it
+        if isinstance(stream, StringIO):
+            yield stream.getvalue()
+        else:
+            yield from stream_wrapper(stream)
         return
 
     assert (output := response.get("output"))
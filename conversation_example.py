@@ -6,6 +6,7 @@ Shows how to use the Converse API with Anthropic Claude 3 Sonnet (on demand).
 
 from __future__ import annotations
 
+import functools
 import logging
 import boto3
 from collections.abc import Sequence
@@ -25,6 +26,11 @@ logging.basicConfig(level=logging.INFO)
 MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
 
 
+@functools.lru_cache(maxsize=None)
+def _client(region: str | None = None) -> BedrockRuntimeClient:
+    return boto3.Session().client("bedrock-runtime", region_name=region)
+
+
 def generate_conversation(
     bedrock_client: BedrockRuntimeClient,
     model_id: str,
@@ -109,7 +115,7 @@ def main():
     messages = []
 
     try:
-        bedrock_client = boto3.client(service_name="bedrock-runtime")
+        bedrock_client = _client()
 
         # Start the conversation with the 1st message.
         messages.append(message_1)
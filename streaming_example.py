@@ -6,9 +6,11 @@ Shows how to use the Converse API to stream a response from Anthropic Claude 3 S
 
 from __future__ import annotations
 
+import functools
 import json
 import logging
-from collections.abc import Generator
+import os
+from collections.abc import Generator, Iterable
 from typing import TYPE_CHECKING
 
 import boto3
@@ -16,20 +18,27 @@ from botocore.exceptions import ClientError
 
 if TYPE_CHECKING:
     from botocore.eventstream import EventStream
+    from mypy_boto3_bedrock_runtime import BedrockRuntimeClient
     from mypy_boto3_bedrock_runtime import type_defs as brtd
 
 logger = logging.getLogger("streaming_example")
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s.%(msecs)03d %(levelname)8s %(name)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s.%(msecs)03d %(levelname)8s %(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
 
 # MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
 # MODEL_ID = "amazon.titan-text-express-v1"
 MODEL_ID = "mistral.mistral-small-2402-v1:0"
 
 
+@functools.lru_cache(maxsize=None)
+def _client(region: str | None = None) -> BedrockRuntimeClient:
+    return boto3.Session().client("bedrock-runtime", region_name=region)
+
+
 def stream_conversation(
     stream: EventStream[brtd.ConverseStreamResponseTypeDef],
 ) -> Generator[brtd.ConverseStreamResponseTypeDef]:
@@ -55,6 +64,31 @@ def stream_conversation(
         yield event
 
 
+def dump_events(events: Iterable[brtd.ConverseStreamResponseTypeDef], path: str) -> None:
+    """
+    Writes events to a file as a JSON list, one event at a time as they arrive.
+    Args:
+        events: The stream events to write.
+        path (str): The file to write them to. It is only replaced once the
+            whole list has been written, so a stream that fails partway
+            through doesn't leave a truncated file behind.
+    """
+
+    partial_path = f"{path}.part"
+    try:
+        with open(partial_path, "w") as fout:
+            fout.write("[\n")
+            for i, event in enumerate(events):
+                if i:
+                    fout.write(",\n")
+                json.dump(event, fout, indent=2)
+            fout.write("\n]\n")
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
 def main():
     """
     Entrypoint for streaming message API response example.
@@ -86,18 +120,13 @@ def main():
     try:
         logger.info("Streaming messages with model %s", MODEL_ID)
 
-        bedrock_client = boto3.client(service_name="bedrock-runtime")
-
-        response = bedrock_client.converse_stream(
+        response = _client().converse_stream(
             modelId=MODEL_ID,
             messages=messages,
             system=system_prompts,
         )
 
-        events = list(stream_conversation(response["stream"]))
-
-        with open("event-stream.json", "w") as fout:
-            json.dump(events, fout, indent=2)
+        dump_events(stream_conversation(response["stream"]), "event-stream.json")
 
     except ClientError as err:
         message = err.response["Error"]["Message"]